@@ -0,0 +1,109 @@
+"""
+Shared pytest fixtures.
+"""
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from dolphin_mcp.docker_sandbox import DockerSandboxExecutor
+from dolphin_mcp.bwrap_sandbox import BwrapSandboxExecutor
+
+
+# Sandbox implementation under test, chosen with SANDBOX_BACKEND=docker|bwrap
+SANDBOX_BACKENDS = {
+    "docker": DockerSandboxExecutor,
+    "bwrap": BwrapSandboxExecutor,
+}
+
+
+class SandboxPool:
+    """
+    Warm sandbox executors keyed by session ID.
+
+    An executor is started the first time its session is acquired and keeps
+    its sandbox running between uses until drain(). It is reset when released,
+    so tests sharing a session don't see each other's variables or files.
+    Session IDs get the pytest-xdist worker ID appended, so parallel workers
+    never share a session directory.
+    """
+
+    def __init__(self, executor_class=DockerSandboxExecutor):
+        self.executor_class = executor_class
+        self._executors = {}
+        self._lock = threading.Lock()
+        self._worker = os.environ.get("PYTEST_XDIST_WORKER")
+        # Why the backend could not start, so later tests skip without retrying
+        self._unavailable = None
+
+    def _start(self, session_id):
+        """Start an executor for the session, skipping the test if the backend is unavailable."""
+        if self._unavailable is not None:
+            pytest.skip(self._unavailable)
+
+        if self._worker:
+            session_id = f"{session_id}-{self._worker}"
+        try:
+            return self.executor_class(session_id=session_id).start()
+        except RuntimeError as e:
+            # Raised by the executors when Docker / bwrap is missing or its interpreter cannot start
+            self._unavailable = f"{self.executor_class.__name__} unavailable: {e}"
+            pytest.skip(self._unavailable)
+
+    @contextmanager
+    def acquire(self, session_id):
+        """
+        Use the warm executor for the session, starting one if none is pooled.
+
+        The executor goes back to the pool afterwards with its sandbox still
+        running, but with fresh globals and an empty /sandbox and session
+        directory (see SandboxExecutor.reset).
+        """
+        with self._lock:
+            executor = self._executors.pop(session_id, None)
+
+        if executor is None:
+            executor = self._start(session_id)
+
+        try:
+            yield executor
+        finally:
+            executor.reset()
+            with self._lock:
+                self._executors[session_id] = executor
+
+    @contextmanager
+    def fresh(self, session_id):
+        """Use a new executor for the session that is closed afterwards instead of pooled."""
+        executor = self._start(session_id)
+        try:
+            yield executor
+        finally:
+            executor.close()
+
+    def drain(self):
+        """Remove the sandboxes of all pooled executors."""
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+
+        for executor in executors:
+            executor.close()
+
+
+@pytest.fixture(scope="session")
+def sandbox_pool():
+    """Pool of sandbox executors shared by the tests of one process, started as tests need them."""
+    backend = os.environ.get("SANDBOX_BACKEND", "docker")
+    if backend not in SANDBOX_BACKENDS:
+        raise pytest.UsageError(f"Unknown SANDBOX_BACKEND {backend!r}; expected one of {sorted(SANDBOX_BACKENDS)}")
+
+    pool = SandboxPool(SANDBOX_BACKENDS[backend])
+    yield pool
+    pool.drain()
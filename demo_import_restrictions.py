@@ -2,61 +2,14 @@
 """
 Demo script showing import restrictions in action.
 """
-import ast
-from typing import Set
+import os
+import sys
 
-# Copy of the validation logic
-ALLOWED_LIBRARIES = {
-    # Standard library modules
-    'sys', 'os', 'math', 'random', 'datetime', 'time', 'json', 'csv', 'io', 'collections',
-    'itertools', 'functools', 'operator', 're', 'string', 'textwrap', 'unicodedata',
-    'struct', 'codecs', 'base64', 'binascii', 'hashlib', 'hmac', 'secrets',
-    'pathlib', 'glob', 'fnmatch', 'tempfile', 'shutil', 'pickle', 'shelve',
-    'sqlite3', 'gzip', 'bz2', 'lzma', 'zipfile', 'tarfile',
-    'configparser', 'argparse', 'logging', 'warnings', 'traceback',
-    'decimal', 'fractions', 'statistics', 'enum', 'typing', 'copy', 'pprint',
-    'heapq', 'bisect', 'array', 'queue', 'threading', 'multiprocessing',
-    'subprocess', 'socket', 'ssl', 'email', 'urllib', 'http', 'html',
-    'xml', 'webbrowser', 'uuid', 'contextlib', 'abc', 'dataclasses',
-    # Third-party allowed libraries
-    'numpy', 'np', 'pandas', 'pd', 'matplotlib', 'plt', 'scipy',
-    'sklearn', 'scikit-learn', 'pdfplumber', 'fitz', 'pymupdf',
-    'docx', 'python-docx', 'pptx', 'python-pptx', 'openpyxl',
-    'chardet', 'magic', 'python-magic',
-}
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from dolphin_mcp.docker_sandbox import validate_imports
 
-def validate_imports(code: str) -> tuple[bool, str]:
-    """Validate that all imports in the code are from allowed libraries."""
-    try:
-        tree = ast.parse(code)
-    except SyntaxError as e:
-        return False, f"Syntax error in code: {e}"
-    
-    disallowed_imports = set()
-    
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                module_name = alias.name.split('.')[0]
-                if module_name not in ALLOWED_LIBRARIES:
-                    disallowed_imports.add(alias.name)
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                module_name = node.module.split('.')[0]
-                if module_name not in ALLOWED_LIBRARIES:
-                    disallowed_imports.add(node.module)
-    
-    if disallowed_imports:
-        return False, (
-            f"Import restriction violation: The following imports are not allowed: {', '.join(sorted(disallowed_imports))}\\n\\n"
-            f"Allowed libraries:\\n"
-            f"- Standard Python library modules\\n"
-            f"- numpy, pandas, matplotlib, scipy, scikit-learn\\n"
-            f"- pdfplumber, pymupdf, python-docx, python-pptx\\n"
-            f"- openpyxl, chardet, python-magic"
-        )
-    
-    return True, ""
 
 def demo_validation():
     """Demonstrate import validation."""
@@ -0,0 +1,280 @@
+"""
+Bubblewrap-based sandboxed Python executor.
+
+Runs the same persistent sandbox interpreter as DockerSandboxExecutor, but in a
+bwrap (bubblewrap) namespace sandbox on the host instead of a Docker container,
+so there is no daemon, image or container start-up involved.
+"""
+
+import os
+import select
+import shutil
+import socket
+import stat
+import struct
+import subprocess
+import tempfile
+import time
+import logging
+from typing import List, Optional
+
+from .sandbox_base import SandboxExecutor, SandboxProtocolError
+
+logger = logging.getLogger(__name__)
+
+
+# Host directories the sandbox sees read-only, besides /usr; merged-/usr systems
+# have these as symlinks, which are recreated instead of bind-mounted
+_SYSTEM_DIRS = ("/bin", "/sbin", "/lib", "/lib32", "/lib64")
+
+# Multipliers for Docker-style memory limits ("512m", "1g", ...)
+_MEMORY_UNITS = {"b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+# Bytes of the interpreter's stderr kept for error messages
+_STDERR_TAIL = 64 * 1024
+
+
+def _parse_memory_limit(memory_limit: str) -> int:
+    """
+    Convert a Docker-style memory limit to bytes.
+
+    Args:
+        memory_limit: Number with an optional b/k/m/g suffix (e.g. "512m")
+
+    Returns:
+        Limit in bytes
+    """
+    value = memory_limit.strip().lower()
+    if value and value[-1] in _MEMORY_UNITS:
+        return int(float(value[:-1]) * _MEMORY_UNITS[value[-1]])
+    return int(value)
+
+
+def _skip_special_entries(directory: str, names: List[str]) -> List[str]:
+    """
+    shutil.copytree ignore function: skip the sandbox's own files and anything
+    but regular files and directories (symlinks, FIFOs, sockets, ...).
+    """
+    skipped = []
+    for name in names:
+        mode = os.lstat(os.path.join(directory, name)).st_mode
+        if name.startswith('script_') or not (stat.S_ISREG(mode) or stat.S_ISDIR(mode)):
+            skipped.append(name)
+    return skipped
+
+
+class _PipeChannel:
+    """
+    Length-prefixed frames over the stdin/stdout pipes of the bwrap process.
+
+    Same interface as the Docker executor's channel; stderr goes to a temporary
+    file so it can never fill a pipe and stall the interpreter.
+    """
+
+    def __init__(self, process: subprocess.Popen, stderr_file):
+        self.process = process
+        self.stderr_file = stderr_file
+
+    def request(self, data: bytes, timeout: float, max_size: int) -> bytes:
+        """
+        Send one frame and wait for the response frame.
+
+        Raises:
+            socket.timeout: No response within timeout seconds
+            ConnectionError: The interpreter exited
+            SandboxProtocolError: The response frame announces more than max_size bytes
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            self.process.stdin.write(struct.pack('>I', len(data)) + data)
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            raise ConnectionError(self._exit_message())
+
+        size, = struct.unpack('>I', self._read_exactly(4, deadline))
+        # The length comes from the sandbox; don't buffer more than a real response can be
+        if size > max_size:
+            raise SandboxProtocolError(f"Response frame of {size} bytes exceeds the limit of {max_size}")
+        return self._read_exactly(size, deadline)
+
+    def _read_exactly(self, size: int, deadline: float) -> bytes:
+        fd = self.process.stdout.fileno()
+        data = bytearray()
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise socket.timeout("Timed out waiting for the sandbox interpreter")
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise ConnectionError(self._exit_message())
+            data += chunk
+        return bytes(data)
+
+    def _exit_message(self) -> str:
+        self.stderr_file.seek(0, os.SEEK_END)
+        self.stderr_file.seek(max(self.stderr_file.tell() - _STDERR_TAIL, 0))
+        error = self.stderr_file.read().decode('utf-8', errors='replace').strip()
+        return f"Sandbox interpreter exited{': ' + error if error else ''}"
+
+    def close(self):
+        try:
+            self.process.kill()
+            self.process.wait()
+        except Exception:
+            pass
+        for stream in (self.process.stdin, self.process.stdout, self.stderr_file):
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+class BwrapSandboxExecutor(SandboxExecutor):
+    """
+    Bubblewrap-based Python sandbox executor with the same API as DockerSandboxExecutor.
+
+    Features:
+    - Persistent interpreter per session in fresh user, mount, PID, IPC, UTS
+      and network namespaces
+    - Host /usr (Python and the allowed libraries) mounted read-only; nothing
+      else of the host filesystem is visible
+    - The session directory is bind-mounted at /sandbox, so files written there
+      appear on the host at <sandbox_base_dir>/<session_id> directly
+    - Memory limit (RLIMIT_DATA); CPU quotas are not supported
+
+    Requires the ``bwrap`` binary and unprivileged user namespaces.
+    """
+
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        sandbox_base_dir: str = "/tmp/sandboxes",
+        memory_limit: str = "512m",
+        enable_network: bool = False,
+        timeout: int = 30,
+        max_output_bytes: int = 10 * 1024 * 1024,
+        python_executable: str = "/usr/bin/python3"
+    ):
+        """
+        Initialize the bubblewrap sandbox executor.
+
+        Args:
+            session_id: Unique session identifier (generated if not provided)
+            sandbox_base_dir: Base directory on host for sandbox volumes
+            memory_limit: Memory limit (e.g., "512m", "1g")
+            enable_network: Whether to enable network access
+            timeout: Execution timeout in seconds
+            max_output_bytes: Maximum bytes of output kept per execution (the rest is discarded)
+            python_executable: Interpreter to run; must live under /usr
+        """
+        bwrap = shutil.which("bwrap")
+        if bwrap is None:
+            raise RuntimeError("bubblewrap is not available: the 'bwrap' binary was not found on PATH")
+
+        # The session directory is bind-mounted as the sandbox's working directory
+        super().__init__(
+            session_id=session_id,
+            sandbox_base_dir=sandbox_base_dir,
+            container_mount_path=self.SCRATCH_DIR,
+            timeout=timeout,
+            max_output_bytes=max_output_bytes,
+        )
+        self.memory_limit = memory_limit
+        self.enable_network = enable_network
+
+        # Sandbox settings never change for a session, so build the command once
+        command = [bwrap, "--unshare-all", "--die-with-parent", "--new-session", "--ro-bind", "/usr", "/usr"]
+        for path in _SYSTEM_DIRS:
+            if os.path.islink(path):
+                command += ["--symlink", os.readlink(path), path]
+            elif os.path.isdir(path):
+                command += ["--ro-bind", path, path]
+        command += [
+            "--ro-bind-try", "/etc/ld.so.cache", "/etc/ld.so.cache",
+            "--proc", "/proc",
+            "--dev", "/dev",
+            "--tmpfs", "/tmp",
+            "--bind", str(self.session_dir), self.SCRATCH_DIR,
+            "--chdir", self.SCRATCH_DIR,
+            "--clearenv",
+            "--setenv", "PATH", "/usr/bin:/bin",
+            "--setenv", "HOME", self.SCRATCH_DIR,
+            "--setenv", "MPLCONFIGDIR", "/tmp",
+            # One BLAS thread, like the Docker sandbox's single-CPU quota
+            "--setenv", "OPENBLAS_NUM_THREADS", "1",
+            "--setenv", "OMP_NUM_THREADS", "1",
+        ]
+        if self.enable_network:
+            command += ["--share-net", "--ro-bind-try", "/etc/resolv.conf", "/etc/resolv.conf"]
+
+        # The limit is set by the interpreter itself before it reads any request
+        limit = _parse_memory_limit(self.memory_limit)
+        prologue = f"import resource\nresource.setrlimit(resource.RLIMIT_DATA, ({limit}, {limit}))\n"
+        self._command = command + self._interpreter_command(python_executable, prologue)
+
+        logger.info(f"Bubblewrap sandbox initialized for session {self.session_id}")
+
+    def _ensure_repl(self) -> _PipeChannel:
+        """
+        Return the channel to the session's interpreter, starting it if needed.
+
+        Returns:
+            Channel to the running interpreter
+        """
+        if self._repl is not None:
+            return self._repl
+
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=stderr_file,
+            close_fds=True,
+        )
+        self._repl = _PipeChannel(process, stderr_file)
+        logger.info(f"Started bubblewrap interpreter for session {self.session_id}")
+
+        return self._repl
+
+    def copy_out(self, container_path: str = SandboxExecutor.SCRATCH_DIR, host_dir: Optional[str] = None) -> List[str]:
+        """
+        Copy a sandbox directory to the host.
+
+        /sandbox is the session directory itself, so without host_dir this only
+        lists the files already there.
+
+        Args:
+            container_path: Directory inside the sandbox, under /sandbox
+            host_dir: Destination directory on the host (defaults to the session directory)
+
+        Returns:
+            List of copied file paths relative to the destination directory
+        """
+        relative = os.path.relpath(container_path, self.SCRATCH_DIR)
+        if relative == ".." or relative.startswith("../"):
+            raise ValueError(f"Only paths under {self.SCRATCH_DIR} can be copied: {container_path}")
+
+        # Sandboxed code can plant symlinks in the session directory pointing
+        # anywhere on the host, so the source must really be inside it
+        root = os.path.realpath(self.session_dir)
+        source = os.path.realpath(os.path.join(root, relative))
+        if os.path.commonpath([root, source]) != root:
+            raise ValueError(f"Path escapes the session directory: {container_path}")
+
+        dest = os.path.realpath(host_dir) if host_dir else root
+        if source != dest:
+            shutil.copytree(source, dest, dirs_exist_ok=True, ignore=_skip_special_entries)
+
+        files = []
+        for directory, _, names in os.walk(source):
+            skipped = set(_skip_special_entries(directory, names))
+            for name in names:
+                if name not in skipped:
+                    files.append(os.path.relpath(os.path.join(directory, name), source))
+        return files
+
+
+__all__ = [
+    'BwrapSandboxExecutor',
+]
@@ -7,112 +7,305 @@ sandbox are mapped to a directory on the host (default: /tmp/sandboxes/<session_
 """
 
 import docker
+import requests
+import atexit
 import uuid
 import os
+import struct
+import tarfile
 import tempfile
+import time
 import traceback
-import ast
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Set
 import logging
+import threading
+
+# Import validation is shared with the other backends; re-exported for existing callers
+from .sandbox_base import ALLOWED_LIBRARIES, SandboxExecutor, SandboxProtocolError, validate_imports, validate_imports_bool
 
 logger = logging.getLogger(__name__)
 
-# Allowed libraries for import
-ALLOWED_LIBRARIES = {
-    # Standard library modules (common ones - this is not exhaustive but covers most use cases)
-    'sys', 'os', 'math', 'random', 'datetime', 'time', 'json', 'csv', 'io', 'collections',
-    'itertools', 'functools', 'operator', 're', 'string', 'textwrap', 'unicodedata',
-    'struct', 'codecs', 'base64', 'binascii', 'hashlib', 'hmac', 'secrets',
-    'pathlib', 'glob', 'fnmatch', 'tempfile', 'shutil', 'pickle', 'shelve',
-    'sqlite3', 'gzip', 'bz2', 'lzma', 'zipfile', 'tarfile',
-    'configparser', 'argparse', 'logging', 'warnings', 'traceback',
-    'decimal', 'fractions', 'statistics', 'enum', 'typing', 'copy', 'pprint',
-    'heapq', 'bisect', 'array', 'queue', 'threading', 'multiprocessing',
-    'subprocess', 'socket', 'ssl', 'email', 'urllib', 'http', 'html',
-    'xml', 'webbrowser', 'uuid', 'contextlib', 'abc', 'dataclasses',
-    # Third-party allowed libraries
-    'numpy', 'np',
-    'pandas', 'pd',
-    'matplotlib', 'plt',
-    'scipy',
-    'sklearn', 'scikit-learn',
-    'pdfplumber',
-    'fitz', 'pymupdf',  # pymupdf imports as 'fitz'
-    'docx', 'python-docx',
-    'pptx', 'python-pptx',
-    'openpyxl',
-    'chardet',
-    'magic', 'python-magic',
-}
-
-
-def validate_imports(code: str) -> tuple[bool, str]:
+# Docker client shared by all executors, and images already known to exist locally
+_DOCKER_CLIENT_CACHE: Optional[docker.DockerClient] = None
+_DOCKER_CLIENT_LOCK = threading.Lock()
+_IMAGE_CHECKED: Set[str] = set()
+
+# Labels identifying sandbox containers and the process that owns them, so
+# containers left behind by a crashed or killed process can be found and removed
+_LABEL_SANDBOX = "dolphin-mcp.sandbox"
+_LABEL_SESSION = "dolphin-mcp.session"
+_LABEL_OWNER = "dolphin-mcp.owner"
+_STALE_CONTAINERS_REAPED = False
+
+def _get_docker_client() -> docker.DockerClient:
     """
-    Validate that all imports in the code are from allowed libraries.
+    Return the process-wide Docker client, connecting on first use.
+    
+    Connecting pings the daemon (and may probe several socket locations), so the
+    result is cached and shared by every DockerSandboxExecutor.
     
-    Args:
-        code: Python code to validate
-        
     Returns:
-        Tuple of (is_valid, error_message)
-        - is_valid: True if all imports are allowed, False otherwise
-        - error_message: Description of disallowed imports if any
+        Connected Docker client
+    """
+    global _DOCKER_CLIENT_CACHE
+    
+    if _DOCKER_CLIENT_CACHE is not None:
+        return _DOCKER_CLIENT_CACHE
+    
+    with _DOCKER_CLIENT_LOCK:
+        if _DOCKER_CLIENT_CACHE is not None:
+            return _DOCKER_CLIENT_CACHE
+        
+        try:
+            # On macOS, Docker Desktop uses a different socket location
+            # Try common socket locations
+            docker_client = None
+            socket_locations = [
+                os.path.expanduser("~/.docker/run/docker.sock"),  # macOS Docker Desktop
+                "/var/run/docker.sock",  # Linux/standard location
+            ]
+            
+            # Try to connect using environment variables first
+            try:
+                docker_client = docker.from_env()
+                docker_client.ping()
+            except:
+                # If from_env() fails, try explicit socket locations
+                docker_client = None
+                for socket_path in socket_locations:
+                    if os.path.exists(socket_path):
+                        try:
+                            docker_client = docker.DockerClient(base_url=f"unix://{socket_path}")
+                            docker_client.ping()
+                            break
+                        except:
+                            docker_client = None
+                            continue
+            
+            if docker_client is None:
+                raise RuntimeError("Could not connect to Docker daemon")
+            
+            _DOCKER_CLIENT_CACHE = docker_client
+            return docker_client
+            
+        except docker.errors.DockerException as e:
+            logger.error(f"Failed to connect to Docker daemon: {e}")
+            raise RuntimeError(
+                f"Docker daemon is not available. Please ensure Docker Desktop is running.\n"
+                f"Error: {e}\n"
+                f"On macOS, start Docker Desktop from Applications or run: open -a Docker"
+            )
+        except Exception as e:
+            logger.error(f"Failed to initialize Docker client: {e}")
+            raise RuntimeError(f"Docker is not available: {e}")
+
+
+def _invalidate_docker_client(client: docker.DockerClient):
+    """
+    Forget the shared Docker client, if it is still `client`, and the image checks made with it.
+    
+    Args:
+        client: Client that failed
+    """
+    global _DOCKER_CLIENT_CACHE
+    
+    with _DOCKER_CLIENT_LOCK:
+        if _DOCKER_CLIENT_CACHE is client:
+            _DOCKER_CLIENT_CACHE = None
+            _IMAGE_CHECKED.clear()
+
+
+def _process_start_time(pid: int) -> Optional[str]:
+    """
+    Return a process's start time in clock ticks since boot, or None if it has exited.
+    
+    Raises:
+        OSError: /proc is not available
     """
     try:
-        tree = ast.parse(code)
-    except SyntaxError as e:
-        return False, f"Syntax error in code: {e}"
-    
-    disallowed_imports = set()
-    
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                module_name = alias.name.split('.')[0]  # Get top-level module
-                if module_name not in ALLOWED_LIBRARIES:
-                    disallowed_imports.add(alias.name)
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                module_name = node.module.split('.')[0]  # Get top-level module
-                if module_name not in ALLOWED_LIBRARIES:
-                    disallowed_imports.add(node.module)
-    
-    if disallowed_imports:
-        allowed_list = ', '.join(sorted(ALLOWED_LIBRARIES))
-        return False, (
-            f"Import restriction violation: The following imports are not allowed: {', '.join(sorted(disallowed_imports))}\n\n"
-            f"Allowed libraries:\n"
-            f"- Standard Python library modules\n"
-            f"- numpy\n"
-            f"- pandas\n"
-            f"- matplotlib\n"
-            f"- scipy\n"
-            f"- scikit-learn (import as sklearn)\n"
-            f"- pdfplumber\n"
-            f"- pymupdf (import as fitz)\n"
-            f"- python-docx (import as docx)\n"
-            f"- python-pptx (import as pptx)\n"
-            f"- openpyxl\n"
-            f"- chardet\n"
-            f"- python-magic (import as magic)"
-        )
+        with open(f"/proc/{pid}/stat") as stat_file:
+            stat = stat_file.read()
+    except FileNotFoundError:
+        if not os.path.isdir("/proc/self"):
+            raise
+        return None
+    # Field 22; the command name in parentheses before it may contain spaces
+    return stat.rpartition(")")[2].split()[19]
+
+
+def _machine_identity() -> Optional[str]:
+    """
+    Identify this kernel boot and PID namespace, or return None without /proc.
+    
+    PIDs are only meaningful within one boot and one PID namespace; processes
+    sharing a hostname (or a remote Docker daemon) may have neither in common.
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as boot_id_file:
+            boot_id = boot_id_file.read().strip()
+        pid_namespace = os.stat("/proc/self/ns/pid").st_ino
+    except OSError:
+        return None
+    return f"{boot_id}:{pid_namespace}"
+
+
+def _owner_label() -> str:
+    """
+    Label value naming this process: machine identity, PID and start time.
+    
+    The start time tells the process apart from a later one that reused its
+    PID. Empty where the identity cannot be read, so the containers are never
+    reaped.
+    """
+    machine = _machine_identity()
+    if machine is None:
+        return ""
+    pid = os.getpid()
+    return f"{machine}:{pid}:{_process_start_time(pid)}"
+
+
+def _reap_stale_containers(client: docker.DockerClient):
+    """
+    Remove sandbox containers whose owning process has provably exited.
+    
+    Session containers idle until they are removed, so a host process that
+    crashed or was killed leaves them running. This runs once per process,
+    before the first container is created. A container is only removed if its
+    owner ran in this boot and PID namespace and its PID is now gone or
+    belongs to a process started later; containers of processes in other
+    namespaces or on other hosts sharing the daemon are left alone.
+    
+    Args:
+        client: Docker client to list and remove containers with
+    """
+    global _STALE_CONTAINERS_REAPED
+    
+    with _DOCKER_CLIENT_LOCK:
+        if _STALE_CONTAINERS_REAPED:
+            return
+        _STALE_CONTAINERS_REAPED = True
+    
+    machine = _machine_identity()
+    if machine is None:
+        return
+    
+    try:
+        containers = client.containers.list(all=True, filters={"label": _LABEL_SANDBOX})
+    except Exception as e:
+        logger.warning(f"Failed to list stale sandbox containers: {e}")
+        return
+    
+    for container in containers:
+        # "<boot id>:<PID namespace>:<pid>:<start time>" (see _owner_label)
+        owner = container.labels.get(_LABEL_OWNER, "").split(":")
+        if len(owner) != 4 or f"{owner[0]}:{owner[1]}" != machine or not owner[2].isdigit():
+            continue
+        try:
+            if _process_start_time(int(owner[2])) == owner[3]:
+                continue  # Still running
+        except OSError:
+            continue
+        
+        try:
+            container.remove(force=True)
+            logger.info(f"Removed stale sandbox container of session {container.labels.get(_LABEL_SESSION)}")
+        except Exception as e:
+            logger.warning(f"Failed to remove stale container {container.id}: {e}")
+
+
+# Options of the in-memory /sandbox working directory
+_SCRATCH_TMPFS_OPTIONS = "size=64m,mode=1777"
+
+# Bytes of the interpreter's stderr kept for error messages
+_REPL_STDERR_TAIL = 64 * 1024
+
+
+class _ReplChannel:
+    """
+    Length-prefixed frames over the attached socket of a ``docker exec``.
+    
+    Without a TTY, Docker multiplexes the exec's stdout and stderr into
+    8-byte-header frames; stdout carries the interpreter's responses and
+    stderr is kept only to explain an unexpected exit.
+    """
+    
+    def __init__(self, exec_socket):
+        self.exec_socket = exec_socket
+        # docker-py wraps the hijacked connection; reads and writes go to the raw socket
+        self.sock = getattr(exec_socket, '_sock', exec_socket)
+        self.stdout = bytearray()
+        self.stderr = bytearray()
+    
+    def request(self, data: bytes, timeout: float, max_size: int) -> bytes:
+        """
+        Send one frame and wait for the response frame.
+        
+        Raises:
+            socket.timeout: No response within timeout seconds
+            ConnectionError: The interpreter exited
+            SandboxProtocolError: The response frame announces more than max_size bytes
+        """
+        deadline = time.monotonic() + timeout
+        self.sock.settimeout(timeout)
+        self.sock.sendall(struct.pack('>I', len(data)) + data)
+        
+        while True:
+            if len(self.stdout) >= 4:
+                size, = struct.unpack_from('>I', self.stdout)
+                # The length comes from the sandbox; don't buffer more than a real response can be
+                if size > max_size:
+                    raise SandboxProtocolError(f"Response frame of {size} bytes exceeds the limit of {max_size}")
+                if len(self.stdout) >= 4 + size:
+                    frame = bytes(self.stdout[4:4 + size])
+                    del self.stdout[:4 + size]
+                    return frame
+            
+            stream, size = struct.unpack('>BxxxL', self._recv_exactly(8, deadline))
+            data = self._recv_exactly(size, deadline)
+            if stream == 1:
+                self.stdout += data
+            else:
+                # Only the tail is needed to explain an exit
+                self.stderr += data
+                del self.stderr[:-_REPL_STDERR_TAIL]
     
-    return True, ""
+    def _recv_exactly(self, size: int, deadline: float) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            self.sock.settimeout(max(deadline - time.monotonic(), 0.001))
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                error = self.stderr.decode('utf-8', errors='replace').strip()
+                raise ConnectionError(f"Sandbox interpreter exited{': ' + error if error else ''}")
+            data += chunk
+        return bytes(data)
+    
+    def close(self):
+        try:
+            self.exec_socket.close()
+        except Exception:
+            pass
 
 
-class DockerSandboxExecutor:
+class DockerSandboxExecutor(SandboxExecutor):
     """
     Docker-based Python sandbox executor with volume mounting.
     
     Features:
     - Isolated Python execution environment
+    - Persistent interpreter per session (variables survive between executions)
     - No access to host filesystem except mounted volumes
     - Files created in container mount path appear on host at <sandbox_base_dir>/<session_id>
     - Resource limits (CPU, memory, network)
     - Non-root user execution for additional security
     """
     
+    # The container died or the daemon went away
+    _backend_errors = (docker.errors.APIError, requests.exceptions.ConnectionError)
+    
     def __init__(
         self,
         session_id: Optional[str] = None,
@@ -123,7 +316,8 @@ class DockerSandboxExecutor:
         memory_limit: str = "512m",
         cpu_quota: int = 100000,  # 100% of one CPU
         enable_network: bool = False,
-        timeout: int = 30
+        timeout: int = 30,
+        max_output_bytes: int = 10 * 1024 * 1024
     ):
         """
         Initialize the Docker sandbox executor.
@@ -138,72 +332,68 @@ class DockerSandboxExecutor:
             cpu_quota: CPU quota in microseconds (100000 = 1 CPU)
             enable_network: Whether to enable network access
             timeout: Execution timeout in seconds
+            max_output_bytes: Maximum bytes of output kept per execution (the rest is discarded)
         """
-        self.session_id = session_id or str(uuid.uuid4())
-        self.sandbox_base_dir = Path(sandbox_base_dir)
+        session_id = session_id or str(uuid.uuid4())
         self.container_mount_base_dir = Path(container_mount_base_dir)
         
-        # Session-specific directory and mount path
-        self.session_dir = self.sandbox_base_dir / self.session_id
-        self.container_mount_path = str(self.container_mount_base_dir / self.session_id)
+        # Session-specific directory on the host, mounted at container_mount_path
+        super().__init__(
+            session_id=session_id,
+            sandbox_base_dir=sandbox_base_dir,
+            container_mount_path=str(self.container_mount_base_dir / session_id),
+            timeout=timeout,
+            max_output_bytes=max_output_bytes,
+        )
         self.image_name = image_name
         self.image_tag = image_tag
         self.full_image_name = f"{image_name}:{image_tag}"
         self.memory_limit = memory_limit
         self.cpu_quota = cpu_quota
         self.enable_network = enable_network
-        self.timeout = timeout
         
-        # Create session-specific directory
-        self.session_dir.mkdir(parents=True, exist_ok=True)
+        # Long-lived container the interpreter runs in, started on first use
+        # (see _ensure_container and _ensure_repl)
+        self._container = None
         
-        # Initialize Docker client
-        try:
-            # On macOS, Docker Desktop uses a different socket location
-            # Try common socket locations
-            docker_client = None
-            socket_locations = [
-                os.path.expanduser("~/.docker/run/docker.sock"),  # macOS Docker Desktop
-                "/var/run/docker.sock",  # Linux/standard location
-            ]
-            
-            # Try to connect using environment variables first
-            try:
-                docker_client = docker.from_env()
-                docker_client.ping()
-            except:
-                # If from_env() fails, try explicit socket locations
-                for socket_path in socket_locations:
-                    if os.path.exists(socket_path):
-                        try:
-                            docker_client = docker.DockerClient(base_url=f"unix://{socket_path}")
-                            docker_client.ping()
-                            break
-                        except:
-                            continue
-            
-            if docker_client is None:
-                raise RuntimeError("Could not connect to Docker daemon")
-            
-            self.docker_client = docker_client
-            logger.info(f"Docker client initialized for session {self.session_id}")
-            
-        except docker.errors.DockerException as e:
-            logger.error(f"Failed to connect to Docker daemon: {e}")
-            raise RuntimeError(
-                f"Docker daemon is not available. Please ensure Docker Desktop is running.\n"
-                f"Error: {e}\n"
-                f"On macOS, start Docker Desktop from Applications or run: open -a Docker"
-            )
-        except Exception as e:
-            logger.error(f"Failed to initialize Docker client: {e}")
-            raise RuntimeError(f"Docker is not available: {e}")
+        # Container settings never change for a session, so build them once
+        self._container_kwargs = {
+            "image": self.full_image_name,
+            "volumes": {
+                str(self.session_dir): {
+                    'bind': self.container_mount_path,
+                    'mode': 'rw'
+                }
+            },
+            "network_mode": 'bridge' if self.enable_network else 'none',
+            "mem_limit": self.memory_limit,
+            "cpu_quota": self.cpu_quota,
+            "user": "sandbox",  # Run as non-root user
+            "security_opt": ["no-new-privileges"],  # Additional security
+            "cap_drop": ["ALL"],  # Drop all capabilities
+            "read_only": False,  # Allow writes to mounted volumes
+            "init": True,  # Reap processes left behind by user code
+            "tmpfs": {self.SCRATCH_DIR: _SCRATCH_TMPFS_OPTIONS},  # In-memory working directory
+            # Lets a later process remove the container if this one dies without closing it
+            "labels": {
+                _LABEL_SANDBOX: "true",
+                _LABEL_SESSION: self.session_id,
+                _LABEL_OWNER: _owner_label(),
+            },
+        }
+        
+        # Docker client is shared across executors (see _get_docker_client)
+        self.docker_client = _get_docker_client()
+        logger.info(f"Docker client initialized for session {self.session_id}")
         
         # Ensure the sandbox image exists
         self._ensure_image_exists()
     
     def _ensure_image_exists(self):
         """Check if the sandbox image exists, pull if not found."""
+        if self.full_image_name in _IMAGE_CHECKED:
+            return
+        
         try:
             self.docker_client.images.get(self.full_image_name)
             
@@ -243,210 +433,232 @@ class DockerSandboxExecutor:
                     f"Error: {e}\n"
                     f"If this is a custom image, build it with: docker build -f Dockerfile.sandbox -t {self.full_image_name} ."
                 )
+        
+        _IMAGE_CHECKED.add(self.full_image_name)
     
-    def execute_code(self, code: str, context: Optional[Dict[str, Any]] = None) -> str:
+    def _ensure_repl(self) -> _ReplChannel:
         """
-        Execute Python code in a sandboxed Docker container.
+        Return the channel to the session's interpreter, starting it if needed.
+        
+        The interpreter runs as one ``docker exec`` in the long-lived container
+        and serves every execution of the session over its attached socket.
         
-        Args:
-            code: Python code to execute
-            context: Optional context dictionary (serialized and passed to container)
-            
         Returns:
-            String output from the code execution
+            Channel to the running interpreter
         """
-        # Validate imports before execution
-        is_valid, error_message = validate_imports(code)
-        if not is_valid:
-            logger.warning(f"Import validation failed: {error_message}")
-            return f"IMPORT RESTRICTION ERROR:\n{error_message}"
+        if self._repl is not None:
+            return self._repl
         
-        # Create a temporary Python script
-        script_path = self.session_dir / f"script_{uuid.uuid4().hex[:8]}.py"
+        container = self._ensure_container()
+        api = self.docker_client.api
+        exec_id = api.exec_create(
+            container.id,
+            self._interpreter_command("python3"),
+            stdin=True,
+            user="sandbox",
+            workdir=self.SCRATCH_DIR,
+        )["Id"]
+        self._repl = _ReplChannel(api.exec_start(exec_id, socket=True))
+        logger.info(f"Started sandbox interpreter for session {self.session_id}")
         
-        try:
-            # Prepare the full script with context loading
-            full_script = self._prepare_script(code, context)
-            
-            # Write script to host
-            script_path.write_text(full_script)
-            
-            # Setup volume mounts
-            volumes = {
-                str(self.session_dir): {
-                    'bind': self.container_mount_path,
-                    'mode': 'rw'
-                }
-            }
-            
-            # Configure network
-            network_mode = 'none' if not self.enable_network else 'bridge'
-            
-            # Run the container
-            logger.info(f"Executing code in Docker container (session: {self.session_id})")
-            
-            # Create and start container with timeout handling
-            container = self.docker_client.containers.create(
-                image=self.full_image_name,
-                command=["python3", f"{self.container_mount_path}/{script_path.name}"],
-                volumes=volumes,
-                network_mode=network_mode,
-                mem_limit=self.memory_limit,
-                cpu_quota=self.cpu_quota,
-                user="sandbox",  # Run as non-root user
-                security_opt=["no-new-privileges"],  # Additional security
-                cap_drop=["ALL"],  # Drop all capabilities
-                read_only=False,  # Allow writes to mounted volumes
-            )
-            
-            try:
-                container.start()
-                exit_status = container.wait(timeout=self.timeout)
-                
-                # Get logs (output)
-                result = container.logs(stdout=True, stderr=True)
-                
-            finally:
-                # Always remove the container
-                try:
-                    container.remove(force=True)
-                except:
-                    pass
-            
-            # Decode output
-            output = result.decode('utf-8')
-            logger.info(f"Code executed successfully in session {self.session_id}")
-            
-            return output
-            
-        except docker.errors.ContainerError as e:
-            error_msg = f"Container execution error:\n{e.stderr.decode('utf-8')}"
-            logger.error(error_msg)
-            return f"EXECUTION ERROR:\n{error_msg}"
-            
-        except Exception as e:
-            error_msg = f"Unexpected error:\n{traceback.format_exc()}"
-            logger.error(error_msg)
-            return f"ERROR:\n{error_msg}"
-            
-        finally:
-            # Optionally clean up script file
-            if script_path.exists():
-                try:
-                    script_path.unlink()
-                except Exception as e:
-                    logger.warning(f"Failed to cleanup script file: {e}")
-    
-    def _prepare_script(self, code: str, context: Optional[Dict[str, Any]] = None) -> str:
+        return self._repl
+    
+    def _ensure_container(self):
         """
-        Prepare the Python script with context loading.
+        Return the session's running container, creating and starting it if needed.
+        
+        The container idles on ``sleep infinity`` and each execution runs as a
+        separate ``docker exec``, so container start-up is paid once per session.
+        Security settings are fixed at creation time and apply to every exec.
+        Containers are labelled with their owning process, so ones left behind
+        by a process that died are removed by the next one (see
+        _reap_stale_containers).
         
-        Args:
-            code: User's Python code
-            context: Optional context dictionary
-            
         Returns:
-            Complete Python script to execute
+            Running Docker container for this session
         """
-        script_parts = [
-            "#!/usr/bin/env python3",
-            "# Sandboxed Python execution",
-            "import sys",
-            "import json",
-            "import traceback",
-            ""
-        ]
-        
-        # Load context if provided
-        if context:
-            script_parts.extend([
-                "# Load context",
-                "import pickle",
-                "context = " + repr(context),
-                "# Inject context into globals",
-                "globals().update(context)",
-                ""
-            ])
-        
-        # Add user code
-        script_parts.extend([
-            "# User code",
-            "try:",
-            "    # Execute user code",
-        ])
-        
-        # Indent user code
-        for line in code.split('\n'):
-            script_parts.append("    " + line)
-        
-        script_parts.extend([
-            "",
-            "except Exception as e:",
-            "    print('EXECUTION ERROR:', file=sys.stderr)",
-            "    traceback.print_exc()",
-            "    sys.exit(1)"
-        ])
-        
-        return '\n'.join(script_parts)
-    
-    def get_session_files(self) -> list:
+        if self._container is not None:
+            return self._container
+        
+        # Pick up a fresh client if the shared one was dropped after a failure
+        self.docker_client = _get_docker_client()
+        self._ensure_image_exists()
+        _reap_stale_containers(self.docker_client)
+        
+        container = self.docker_client.containers.create(
+            command=["sleep", "infinity"],
+            **self._container_kwargs,
+        )
+        
+        try:
+            container.start()
+        except Exception:
+            container.remove(force=True)
+            raise
+        
+        self._container = container
+        logger.info(f"Started sandbox container for session {self.session_id}")
+        
+        return container
+    
+    def _check_docker_connection(self):
         """
-        Get list of files created in the session directory.
+        Ping the daemon after a failed Docker operation.
         
-        Returns:
-            List of file paths relative to session directory
+        The shared client is only pinged when it is created; if it no longer
+        answers, it is dropped so the next container creation reconnects.
         """
-        if not self.session_dir.exists():
-            return []
+        try:
+            self.docker_client.ping()
+        except Exception as e:
+            logger.warning(f"Docker daemon did not answer ping, reconnecting on next use: {e}")
+            _invalidate_docker_client(self.docker_client)
+    
+    def _recover(self):
+        """Reconnect on next use if the daemon went away."""
+        self._check_docker_connection()
+    
+    def _teardown(self):
+        """Disconnect from the interpreter and remove the container; called with _repl_lock held."""
+        self._close_repl()
         
-        files = []
-        for item in self.session_dir.rglob('*'):
-            if item.is_file() and not item.name.startswith('script_'):
-                files.append(str(item.relative_to(self.session_dir)))
+        container, self._container = self._container, None
+        if container is None:
+            return
         
-        return files
+        try:
+            container.remove(force=True)
+            logger.info(f"Removed sandbox container for session {self.session_id}")
+        except Exception as e:
+            logger.warning(f"Failed to remove container for session {self.session_id}: {e}")
     
-    def read_session_file(self, filename: str) -> str:
+    def copy_out(self, container_path: str = SandboxExecutor.SCRATCH_DIR, host_dir: Optional[str] = None) -> List[str]:
         """
-        Read a file from the session directory.
-        
+        Copy a directory out of the session container in a single archive.
+
+        Files written to the in-memory /sandbox directory are not visible on
+        the host until they are copied out.
+
         Args:
-            filename: Filename relative to session directory
-            
+            container_path: Directory inside the container to copy
+            host_dir: Destination directory on the host (defaults to the session directory)
+
         Returns:
-            File contents as string
+            List of copied file paths relative to the destination directory
         """
-        file_path = self.session_dir / filename
+        if self._container is None:
+            raise RuntimeError("No running sandbox container to copy from")
         
-        if not file_path.exists():
-            raise FileNotFoundError(f"File not found: {filename}")
+        dest = Path(host_dir) if host_dir else self.session_dir
+        dest.mkdir(parents=True, exist_ok=True)
         
-        if not file_path.is_relative_to(self.session_dir):
-            raise ValueError("Path traversal attempt detected")
+        stream, _ = self._container.get_archive(container_path)
+        with tempfile.TemporaryFile() as archive:
+            for chunk in stream:
+                archive.write(chunk)
+            archive.seek(0)
+            
+            # Sandboxed code can plant symlinks in the session directory through
+            # its mount, so every member must really land inside dest; older
+            # Pythons have no tarfile.data_filter to check this for us
+            root = os.path.realpath(dest)
+            with tarfile.open(fileobj=archive) as tar:
+                members = []
+                for member in tar.getmembers():
+                    # Strip the leading "<basename>/" so the contents land directly in dest
+                    name = member.name.partition('/')[2]
+                    if not name or not (member.isfile() or member.isdir()):
+                        continue
+                    target = os.path.realpath(os.path.join(root, name))
+                    if name.startswith('/') or os.path.commonpath([root, target]) != root:
+                        logger.warning(f"Skipping unsafe archive member: {member.name}")
+                        continue
+                    member.name = name
+                    members.append(member)
+                
+                if hasattr(tarfile, 'data_filter'):
+                    tar.extractall(dest, members=members, filter='data')
+                else:
+                    tar.extractall(dest, members=members)
         
-        return file_path.read_text()
+        return [member.name for member in members if member.isfile()]
+
+
+# Executors kept alive between sandboxed_python_interpreter calls, most recently
+# used last, so a session keeps its container across turns
+_MAX_SESSION_EXECUTORS = 16
+_SESSION_EXECUTORS: "OrderedDict[tuple, DockerSandboxExecutor]" = OrderedDict()
+# Number of calls using each cached executor; those in use are never evicted
+_SESSION_EXECUTOR_USERS: Dict[tuple, int] = {}
+_SESSION_EXECUTORS_LOCK = threading.Lock()
+
+
+@contextmanager
+def _session_executor(session_id: str, image_name: str, image_tag: str):
+    """
+    Use the cached executor for a session, creating it if needed.
     
-    def cleanup(self):
-        """
-        Clean up session directory and resources.
-        """
-        try:
-            if self.session_dir.exists():
-                import shutil
-                shutil.rmtree(self.session_dir)
-                logger.info(f"Cleaned up session directory: {self.session_id}")
-        except Exception as e:
-            logger.error(f"Failed to cleanup session {self.session_id}: {e}")
+    The executor stays pinned in the cache while the block runs. Otherwise
+    another thread could evict and close it in between, and the execution
+    would start a container on an executor nothing tracks any more. Once
+    more than _MAX_SESSION_EXECUTORS sessions are cached, the least recently
+    used executors not in use are closed (their containers removed; session
+    files are kept).
     
-    def __enter__(self):
-        """Context manager entry."""
-        return self
+    Args:
+        session_id: Sandbox session ID
+        image_name: Docker image name
+        image_tag: Docker image tag
+        
+    Yields:
+        Executor for the session
+    """
+    key = (session_id, image_name, image_tag)
+    
+    with _SESSION_EXECUTORS_LOCK:
+        executor = _SESSION_EXECUTORS.get(key)
+        if executor is not None:
+            _SESSION_EXECUTORS.move_to_end(key)
+            _SESSION_EXECUTOR_USERS[key] = _SESSION_EXECUTOR_USERS.get(key, 0) + 1
+    
+    if executor is None:
+        # Construction may connect to the daemon or pull the image, so it happens
+        # outside the lock; if another thread cached an executor meanwhile, use that
+        created = DockerSandboxExecutor(session_id=session_id, image_name=image_name, image_tag=image_tag)
+        
+        with _SESSION_EXECUTORS_LOCK:
+            executor = _SESSION_EXECUTORS.setdefault(key, created)
+            _SESSION_EXECUTORS.move_to_end(key)
+            _SESSION_EXECUTOR_USERS[key] = _SESSION_EXECUTOR_USERS.get(key, 0) + 1
+    
+    try:
+        yield executor
+    finally:
+        evicted = []
+        with _SESSION_EXECUTORS_LOCK:
+            users = _SESSION_EXECUTOR_USERS.pop(key, 1) - 1
+            if users:
+                _SESSION_EXECUTOR_USERS[key] = users
+            
+            idle = [cached for cached in _SESSION_EXECUTORS if cached not in _SESSION_EXECUTOR_USERS]
+            for cached in idle[:max(len(_SESSION_EXECUTORS) - _MAX_SESSION_EXECUTORS, 0)]:
+                evicted.append(_SESSION_EXECUTORS.pop(cached))
+        
+        for old in evicted:
+            old.close()
+
+
+def _close_session_executors():
+    """Remove the containers of all cached session executors."""
+    with _SESSION_EXECUTORS_LOCK:
+        executors = list(_SESSION_EXECUTORS.values())
+        _SESSION_EXECUTORS.clear()
     
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit with cleanup."""
-        # Optionally cleanup on exit
-        # self.cleanup()
-        pass
+    for executor in executors:
+        executor.close()
+
+
+atexit.register(_close_session_executors)
 
 
 def sandboxed_python_interpreter(
@@ -481,15 +693,17 @@ def sandboxed_python_interpreter(
             context['__sandbox_session_id__'] = session_id
     
     try:
-        executor = DockerSandboxExecutor(session_id=session_id, image_name=image_name, image_tag=image_tag)
-        output = executor.execute_code(code, context)
-        return output
+        with _session_executor(session_id, image_name, image_tag) as executor:
+            return executor.execute_code(code, context)
     except Exception as e:
         return f"SANDBOX ERROR:\n{traceback.format_exc()}"
 
 
 # Export main classes and functions
 __all__ = [
+    'ALLOWED_LIBRARIES',
     'DockerSandboxExecutor',
-    'sandboxed_python_interpreter'
+    'sandboxed_python_interpreter',
+    'validate_imports',
+    'validate_imports_bool',
 ]
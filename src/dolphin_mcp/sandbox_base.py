@@ -0,0 +1,951 @@
+"""
+Backend-independent parts of the sandboxed Python executors.
+
+Import validation, the persistent interpreter that runs inside the sandbox, and
+SandboxExecutor, the base class the Docker and bubblewrap executors share. A
+backend only has to start the interpreter and copy files out of the sandbox.
+"""
+
+import abc
+import ast
+import functools
+import hashlib
+import json
+import logging
+import marshal
+import os
+import pickle
+import re
+import shutil
+import socket
+import sys
+import threading
+import traceback
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Allowed libraries for import
+ALLOWED_LIBRARIES = frozenset({
+    # Standard library modules (common ones - this is not exhaustive but covers most use cases)
+    'sys', 'os', 'math', 'random', 'datetime', 'time', 'json', 'csv', 'io', 'collections',
+    'itertools', 'functools', 'operator', 're', 'string', 'textwrap', 'unicodedata',
+    'struct', 'codecs', 'base64', 'binascii', 'hashlib', 'hmac', 'secrets',
+    'pathlib', 'glob', 'fnmatch', 'tempfile', 'shutil', 'pickle', 'shelve',
+    'sqlite3', 'gzip', 'bz2', 'lzma', 'zipfile', 'tarfile',
+    'configparser', 'argparse', 'logging', 'warnings', 'traceback',
+    'decimal', 'fractions', 'statistics', 'enum', 'typing', 'copy', 'pprint',
+    'heapq', 'bisect', 'array', 'queue', 'threading', 'multiprocessing',
+    'subprocess', 'socket', 'ssl', 'email', 'urllib', 'http', 'html',
+    'xml', 'webbrowser', 'uuid', 'contextlib', 'abc', 'dataclasses',
+    # Third-party allowed libraries
+    'numpy', 'np',
+    'pandas', 'pd',
+    'matplotlib', 'plt',
+    'scipy',
+    'sklearn', 'scikit-learn',
+    'pdfplumber',
+    'fitz', 'pymupdf',  # pymupdf imports as 'fitz'
+    'docx', 'python-docx',
+    'pptx', 'python-pptx',
+    'openpyxl',
+    'chardet',
+    'magic', 'python-magic',
+})
+
+
+# Statement nodes whose bodies may contain further statements. Imports are
+# statements, so they can only appear inside these; expressions are never visited.
+_IMPORT_CONTAINERS = tuple(
+    getattr(ast, name) for name in (
+        'Module', 'If', 'For', 'AsyncFor', 'While', 'With', 'AsyncWith',
+        'Try', 'TryStar', 'ExceptHandler', 'Match', 'match_case',
+        'FunctionDef', 'AsyncFunctionDef', 'ClassDef',
+    )
+    if hasattr(ast, name)  # TryStar/Match only exist on newer Pythons
+)
+_IMPORT_CONTAINER_FIELDS = ('body', 'orelse', 'handlers', 'finalbody', 'cases')
+
+
+# Every import statement contains "import" as a standalone token, so code with
+# no match cannot import anything (words like "important" or "__import__" don't match)
+_IMPORT_KEYWORD = re.compile(r'\bimport\b')
+
+
+# By default, scanning stops once this many distinct disallowed imports have been found
+_MAX_REPORTED_IMPORTS = 10
+
+
+# Fixed part of the import violation message
+_ALLOWED_LIBRARIES_MESSAGE = (
+    "\n\n"
+    "Allowed libraries:\n"
+    "- Standard Python library modules\n"
+    "- numpy\n"
+    "- pandas\n"
+    "- matplotlib\n"
+    "- scipy\n"
+    "- scikit-learn (import as sklearn)\n"
+    "- pdfplumber\n"
+    "- pymupdf (import as fitz)\n"
+    "- python-docx (import as docx)\n"
+    "- python-pptx (import as pptx)\n"
+    "- openpyxl\n"
+    "- chardet\n"
+    "- python-magic (import as magic)"
+)
+
+
+def _format_import_error(disallowed_imports) -> str:
+    """Build the user-facing message listing disallowed imports."""
+    return (
+        "Import restriction violation: The following imports are not allowed: "
+        + ', '.join(sorted(disallowed_imports))
+        + _ALLOWED_LIBRARIES_MESSAGE
+    )
+
+
+class _StopScan(Exception):
+    """Raised by _ImportCollector to end the scan early."""
+
+
+class _ImportCollector(ast.NodeVisitor):
+    """
+    Collect disallowed imports from a parsed module.
+    
+    Only statements are visited: generic_visit descends into the bodies of
+    compound statements and nothing else, so expression subtrees are skipped.
+    """
+    
+    def __init__(self, fail_fast: bool = False, max_reported: int = _MAX_REPORTED_IMPORTS):
+        self.fail_fast = fail_fast
+        self.max_reported = 1 if fail_fast else max_reported
+        # Violations are rare and few, so a short list beats hashing into a set
+        self.disallowed: List[str] = []
+    
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self._check(alias.name)
+    
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.module:  # None for relative imports ("from . import x")
+            self._check(node.module)
+    
+    def generic_visit(self, node: ast.AST):
+        if isinstance(node, _IMPORT_CONTAINERS):
+            for field in _IMPORT_CONTAINER_FIELDS:
+                for child in getattr(node, field, ()):
+                    self.visit(child)
+    
+    def _check(self, name: str):
+        module_name = name.partition('.')[0]  # Get top-level module
+        if module_name in ALLOWED_LIBRARIES or name in self.disallowed:
+            return
+        self.disallowed.append(name)
+        if len(self.disallowed) >= self.max_reported:
+            raise _StopScan
+
+
+def validate_imports(code: str, fail_fast: bool = False,
+                     max_reported: int = _MAX_REPORTED_IMPORTS) -> tuple[bool, str]:
+    """
+    Validate that all imports in the code are from allowed libraries.
+    
+    Code without the "import" keyword is accepted without parsing (syntax errors
+    then surface when the code runs). Other results are cached per code string,
+    so re-submitted snippets are not parsed again.
+    
+    Args:
+        code: Python code to validate
+        fail_fast: Stop at the first disallowed import and report only that one,
+            instead of collecting up to max_reported violations
+        max_reported: Stop scanning once this many distinct disallowed imports
+            have been found (ignored when fail_fast is set)
+        
+    Returns:
+        Tuple of (is_valid, error_message)
+        - is_valid: True if all imports are allowed, False otherwise
+        - error_message: Description of disallowed imports if any
+    """
+    # False positives (e.g. "import" inside a string) fall through to the full parse
+    if not _IMPORT_KEYWORD.search(code):
+        return True, ""
+    
+    return _validate_imports_cached(code, fail_fast, max_reported)
+
+
+def validate_imports_bool(code: str) -> bool:
+    """
+    Check whether all imports in the code are from allowed libraries.
+    
+    Cheaper than validate_imports() when only the verdict is needed: the scan
+    stops at the first disallowed import.
+    
+    Args:
+        code: Python code to validate
+        
+    Returns:
+        True if all imports are allowed (and the code parses), False otherwise
+    """
+    return validate_imports(code, fail_fast=True)[0]
+
+
+@functools.lru_cache(maxsize=256)
+def _validate_imports_cached(code: str, fail_fast: bool, max_reported: int) -> tuple[bool, str]:
+    """Implementation of validate_imports(), memoized on its arguments."""
+    try:
+        tree = ast.parse(code, type_comments=False)
+    except SyntaxError as e:
+        return False, f"Syntax error in code: {e}"
+    
+    collector = _ImportCollector(fail_fast, max_reported)
+    try:
+        collector.visit(tree)
+    except _StopScan:
+        pass
+    
+    if collector.disallowed:
+        return False, _format_import_error(collector.disallowed)
+    
+    return True, ""
+
+
+# Lets callers (e.g. benchmarks) drop memoized results to measure parse cost
+validate_imports.cache_clear = _validate_imports_cached.cache_clear
+
+
+# Grace period the sandbox interpreter gets beyond the time limit to interrupt
+# user code itself, before the host gives up on it and stops the sandbox
+_TIMEOUT_KILL_GRACE = 5
+
+# Context pickle written to the session directory. The 'script_' prefix keeps it
+# out of get_session_files().
+_CONTEXT_FILENAME = "script_context.pkl"
+
+# Filenames user code is compiled under, as shown in tracebacks
+_USER_CODE_FILENAME = "<sandbox>"
+_CELL_FILENAME = "<sandbox-cell-%d>"
+
+# Bound on a response frame: JSON escapes a byte of output into at most six
+# (\u00XX, or \ufffd for an invalid byte), plus a fixed allowance per cell and
+# per response for the rest of the frame and driver error messages
+_JSON_ESCAPE_FACTOR = 6
+_RESPONSE_CELL_OVERHEAD = 16
+_RESPONSE_OVERHEAD = 64 * 1024
+
+
+class SandboxProtocolError(ValueError):
+    """A response from the sandbox interpreter is malformed, oversized or answers another request."""
+
+# Persistent interpreter run in the sandbox (python3 -u -c). It reads
+# requests from stdin as 4-byte big-endian length + marshal payload and answers
+# on stdout as 4-byte length + JSON. User code runs in one namespace that lives
+# as long as the interpreter, so variables persist between executions. While a
+# cell runs, fds 1 and 2 point at a file of its own, so output from print() as
+# well as subprocesses and C extensions is captured in order. User code runs in
+# the same process, though, and can still write to the protocol stream, so the
+# host treats responses as untrusted: their size is bounded (_response_limit)
+# and each must echo the nonce of its request.
+_REPL_DRIVER = r'''
+import contextlib, io, json, linecache, marshal, os, pickle, signal, struct, sys, tempfile, traceback
+
+try:
+    import ctypes
+    _libc_fflush = ctypes.CDLL(None).fflush
+except Exception:
+    _libc_fflush = None
+
+
+class _Timeout(BaseException):
+    pass
+
+
+class _Capture(io.TextIOBase):
+    """Write output to a file descriptor up to a byte budget and drop the rest."""
+
+    def __init__(self, fd, budget):
+        self.fd = fd
+        self.size = 0
+        self.budget = budget
+        self.truncated = False
+
+    def writable(self):
+        return True
+
+    def fileno(self):
+        return self.fd
+
+    def write(self, text):
+        data = text.encode('utf-8', 'replace')
+        room = self.budget - self.size
+        if len(data) > room:
+            data = data[:room]
+            self.truncated = True
+        if data:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+            self.size += len(data)
+        return len(text)
+
+
+def _flush_c_stdio():
+    # C extensions buffer stdout themselves; flush it into the cell's file
+    if _libc_fflush is not None:
+        _libc_fflush(None)
+
+
+def _point_output_at(fd):
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+
+
+def _read_output(output_file, budget):
+    """Return up to budget bytes of a cell's output file and whether there was more."""
+    size = os.fstat(output_file.fileno()).st_size
+    output_file.seek(0)
+    data = output_file.read(budget)
+    return data, size > len(data)
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout
+
+
+def _read_exactly(stream, size):
+    data = b''
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError
+        data += chunk
+    return data
+
+
+# Longest driver error message, so error responses fit the host's size limit
+_MAX_ERROR_CHARS = 4096
+
+
+def _error_response(message):
+    return {'outputs': ['EXECUTION ERROR:\n' + message[:_MAX_ERROR_CHARS]], 'truncated': False, 'timed_out': False}
+
+
+# Digest of the context last loaded into the namespace
+_context_digest = None
+
+
+def _run(request, namespace):
+    global _context_digest
+    # The context is only applied when it changes, so it doesn't undo
+    # assignments made by earlier executions
+    if request['context'] and request['context_digest'] != _context_digest:
+        # The context pickles on the host but may not unpickle here (host-only
+        # classes, library version mismatches)
+        try:
+            with open(request['context'], 'rb') as context_file:
+                namespace.update(pickle.load(context_file))
+        except Exception as e:
+            return _error_response('Could not load context: ' + ''.join(traceback.format_exception_only(type(e), e)))
+        _context_digest = request['context_digest']
+
+    payload = io.BytesIO(request['payload'])
+    version = marshal.load(payload)
+    sources = marshal.load(payload)
+    # Code objects only load on the Python version they were compiled with
+    codes = marshal.load(payload) if version == tuple(sys.version_info[:2]) else [None] * len(sources)
+
+    captures = []
+    budget = request['max_output_bytes']
+    timed_out = False
+    signal.setitimer(signal.ITIMER_REAL, request['timeout'])
+    try:
+        for source, code, filename in zip(sources, codes, request['filenames']):
+            output_file = tempfile.TemporaryFile()
+            capture = _Capture(output_file.fileno(), budget)
+            captures.append((capture, output_file))
+            _point_output_at(output_file.fileno())
+            with contextlib.redirect_stdout(capture), contextlib.redirect_stderr(capture):
+                try:
+                    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+                    exec(code or compile(source, filename, 'exec'), namespace)
+                except SystemExit:
+                    break
+                except _Timeout:
+                    timed_out = True
+                    break
+                except BaseException as e:
+                    print('EXECUTION ERROR:', file=sys.stderr)
+                    # Skip this driver's own frame
+                    traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+                    break
+            budget -= capture.size
+    except _Timeout:
+        timed_out = True
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        _flush_c_stdio()
+        _point_output_at(_DEVNULL)
+
+    outputs = []
+    truncated = False
+    budget = request['max_output_bytes']
+    for capture, output_file in captures:
+        with output_file:
+            data, more = _read_output(output_file, budget)
+        budget -= len(data)
+        truncated = truncated or more or capture.truncated
+        outputs.append(data.decode('utf-8', 'replace'))
+
+    return {'outputs': outputs, 'truncated': truncated, 'timed_out': timed_out}
+
+
+# Where fds 0-2 point outside of cells
+_DEVNULL = os.open(os.devnull, os.O_RDWR)
+
+
+def _main():
+    # Keep private copies of the protocol streams and point fds 0-2 elsewhere, so
+    # subprocesses don't inherit them and stray output (threads, C extensions)
+    # doesn't end up in a response. This is not a security boundary: user code
+    # can still find and use the copies, which is why the host checks every
+    # response. Output between cells is discarded rather than left in the
+    # stderr tail the host reports when the interpreter exits. The driver's own
+    # errors still go to the real stderr.
+    requests = os.fdopen(os.dup(0), 'rb')
+    responses = os.fdopen(os.dup(1), 'wb')
+    sys.stderr = os.fdopen(os.dup(2), 'w')
+    os.dup2(_DEVNULL, 0)
+    _point_output_at(_DEVNULL)
+    sys.stdin = io.StringIO()
+    signal.signal(signal.SIGALRM, _on_alarm)
+    namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+    while True:
+        try:
+            size, = struct.unpack('>I', _read_exactly(requests, 4))
+            frame = _read_exactly(requests, size)
+        except EOFError:
+            return
+        # Nothing may end the loop but EOF, or the session's namespace is lost
+        request = {}
+        try:
+            request = marshal.loads(frame)
+            response = _run(request, namespace)
+        except BaseException as e:
+            response = _error_response(
+                'Sandbox interpreter failed: ' + ''.join(traceback.format_exception_only(type(e), e))
+            )
+        response['nonce'] = request.get('nonce')
+        response = json.dumps(response).encode('utf-8')
+        responses.write(struct.pack('>I', len(response)) + response)
+        responses.flush()
+
+
+_main()
+'''
+
+
+def _write_file(path: Path, data: bytes):
+    """
+    Write bytes to a file through a raw descriptor, bypassing Python's buffered I/O.
+    
+    Files are created world-readable so the container's sandbox user can read them.
+    
+    Args:
+        path: File to create or truncate
+        data: Contents to write
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:  # os.write may write less than asked for
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def _compile_cells(cells: List[str], filenames: List[str]) -> bytes:
+    """
+    Serialize code cells for the sandbox interpreter.
+    
+    The payload is three marshal records: the host's (major, minor) Python
+    version, the list of sources, and the list of compiled code objects. Code
+    objects only load on the same minor version, so the interpreter checks the
+    version first and falls back to compiling the sources. If any cell does
+    not compile on the host, the version is None and every cell is compiled in
+    the container, so earlier cells still run before the error is reported.
+    
+    Args:
+        cells: Python code of each cell
+        filenames: Filename each cell is compiled under
+        
+    Returns:
+        Marshalled payload bytes
+    """
+    sources = list(cells)
+    try:
+        compiled = [
+            compile(source, filename, 'exec', dont_inherit=True)
+            for source, filename in zip(sources, filenames)
+        ]
+    except (SyntaxError, ValueError):
+        return marshal.dumps(None) + marshal.dumps(sources)
+    
+    return marshal.dumps(tuple(sys.version_info[:2])) + marshal.dumps(sources) + marshal.dumps(compiled)
+
+
+
+class SandboxExecutor(abc.ABC):
+    """
+    Base class of the sandboxed Python executors.
+    
+    Each session has one persistent interpreter in its sandbox, which serves
+    every execution, so variables survive between executions. Subclasses
+    start the interpreter (_ensure_repl), stop the sandbox (_teardown) and
+    copy files out of it (copy_out).
+    """
+    
+    # Working directory inside the sandbox
+    SCRATCH_DIR = "/sandbox"
+    
+    # Errors from the backend that mean the sandbox itself failed; the sandbox
+    # is stopped and _recover() called, so the next execution starts afresh
+    _backend_errors: tuple = ()
+    
+    def __init__(
+        self,
+        session_id: Optional[str],
+        sandbox_base_dir: str,
+        container_mount_path: str,
+        timeout: int,
+        max_output_bytes: int
+    ):
+        """
+        Initialize the state shared by all sandbox executors.
+        
+        Args:
+            session_id: Unique session identifier (generated if not provided)
+            sandbox_base_dir: Base directory on host for sandbox volumes
+            container_mount_path: Where the session directory appears inside the sandbox
+            timeout: Execution timeout in seconds
+            max_output_bytes: Maximum bytes of output kept per execution (the rest is discarded)
+        """
+        self.session_id = session_id or str(uuid.uuid4())
+        self.sandbox_base_dir = Path(sandbox_base_dir)
+        self.session_dir = self.sandbox_base_dir / self.session_id
+        self.container_mount_path = container_mount_path
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        
+        # Digest of the last context written to the session directory
+        self._context_digest: Optional[bytes] = None
+        
+        # Channel to the session's interpreter, started on first use (see _ensure_repl)
+        self._repl = None
+        self._repl_lock = threading.Lock()
+        
+        # Create session-specific directory
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def _interpreter_command(python: str, prologue: str = "") -> List[str]:
+        """
+        Command line that runs the sandbox interpreter.
+        
+        Args:
+            python: Python executable inside the sandbox
+            prologue: Code run before the interpreter starts serving requests
+            
+        Returns:
+            Command line as a list of arguments
+        """
+        return [python, "-u", "-c", prologue + _REPL_DRIVER]
+    
+    def execute_code(self, code: str, context: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Execute Python code in the session's sandbox.
+        
+        Code runs in the session's persistent interpreter, so variables defined
+        by one execution are visible to the next. The context's variables are
+        loaded into the session's globals only when the context differs from
+        the one last loaded, so passing the same context again does not reset
+        variables that earlier executions changed.
+        
+        Args:
+            code: Python code to execute
+            context: Optional context dictionary (serialized and passed to the sandbox)
+            
+        Returns:
+            String output from the code execution
+        """
+        # Validate imports before execution
+        is_valid, error_message = validate_imports(code)
+        if not is_valid:
+            logger.warning(f"Import validation failed: {error_message}")
+            return f"IMPORT RESTRICTION ERROR:\n{error_message}"
+        
+        outputs = self._execute([code], [_USER_CODE_FILENAME], context)
+        return outputs[0] if outputs else ""
+    
+    def execute_cells(self, cells: List[str], context: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Execute several code cells in one round-trip, notebook style.
+        
+        The cells run in order in the session's interpreter and share its
+        globals. Execution stops at the first cell that raises; cells after it
+        are not run and get empty output.
+        
+        Args:
+            cells: Python code of each cell
+            context: Optional context dictionary (serialized and passed to the sandbox)
+            
+        Returns:
+            List with the output of each cell
+        """
+        if not cells:
+            return []
+        
+        # Nothing runs if any cell fails validation
+        for index, cell in enumerate(cells):
+            is_valid, error_message = validate_imports(cell)
+            if not is_valid:
+                logger.warning(f"Import validation failed in cell {index}: {error_message}")
+                outputs = [""] * len(cells)
+                outputs[index] = f"IMPORT RESTRICTION ERROR:\n{error_message}"
+                return outputs
+        
+        outputs = self._execute(cells, [_CELL_FILENAME % index for index in range(len(cells))], context)
+        return outputs + [""] * (len(cells) - len(outputs))
+    
+    def _execute(self, cells: List[str], filenames: List[str],
+                 context: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Send cells to the session's interpreter and collect their output.
+        
+        Args:
+            cells: Python code of each cell
+            filenames: Filename each cell is compiled under
+            context: Optional context dictionary
+            
+        Returns:
+            Output of each cell that ran; errors are reported in the last entry
+        """
+        try:
+            # Context is delivered as a pickle file in the mounted session directory
+            context_path = None
+            if context:
+                self._write_context(context)
+                context_path = f"{self.container_mount_path}/{_CONTEXT_FILENAME}"
+            
+            logger.info(f"Executing code in sandbox (session: {self.session_id})")
+            
+            # The interpreter interrupts user code at the time limit itself; the
+            # grace period covers code that ignores or blocks the interruption
+            with self._repl_lock:
+                repl = self._ensure_repl()
+                try:
+                    response = self._request(repl, cells, filenames, context_path)
+                except socket.timeout:
+                    logger.warning(f"Sandbox interpreter unresponsive in session {self.session_id}, stopping the sandbox")
+                    self._teardown()
+                    return [f"EXECUTION ERROR:\nExecution timed out after {self.timeout} seconds"]
+                except ConnectionError:
+                    # The interpreter died (e.g. killed for exceeding the memory
+                    # limit); start a fresh one next time
+                    self._close_repl()
+                    raise
+                except ValueError:
+                    # Code in the sandbox wrote to the protocol stream; nothing
+                    # it left behind can be trusted, so replace the whole sandbox
+                    logger.warning(f"Invalid response from the sandbox interpreter in session {self.session_id}, stopping the sandbox")
+                    self._teardown()
+                    raise
+            
+            outputs = response["outputs"] or [""]
+            
+            if response["truncated"]:
+                logger.warning(f"Output truncated to {self.max_output_bytes} bytes in session {self.session_id}")
+                outputs[-1] += f"\n[Output truncated to {self.max_output_bytes} bytes]"
+            
+            if response["timed_out"]:
+                logger.warning(f"Code execution timed out in session {self.session_id}")
+                outputs[-1] += f"\nEXECUTION ERROR:\nExecution timed out after {self.timeout} seconds"
+                return outputs
+            
+            logger.info(f"Code executed successfully in session {self.session_id}")
+            
+            return outputs
+            
+        except self._backend_errors:
+            # The sandbox may have died (e.g. the Docker daemon restarted); stop
+            # it so the next execution starts a fresh one
+            error_msg = f"Unexpected error:\n{traceback.format_exc()}"
+            logger.error(error_msg)
+            self.close()
+            self._recover()
+            return [f"ERROR:\n{error_msg}"]
+            
+        except Exception as e:
+            error_msg = f"Unexpected error:\n{traceback.format_exc()}"
+            logger.error(error_msg)
+            return [f"ERROR:\n{error_msg}"]
+    
+    def _request(self, repl, cells: List[str], filenames: List[str], context_path: Optional[str]) -> Dict[str, Any]:
+        """
+        Run cells in the session's interpreter and check its response.
+        
+        Responses are untrusted, since user code can write to the protocol
+        stream: the channel rejects frames over _response_limit(), and a
+        response must echo the request's nonce, so a forged frame cannot pass
+        for this request's answer or leave later requests reading stale ones.
+        
+        Args:
+            repl: Channel to the interpreter
+            cells: Python code of each cell
+            filenames: Filename each cell is compiled under
+            context_path: Context pickle inside the sandbox, if any
+            
+        Returns:
+            Decoded response
+            
+        Raises:
+            socket.timeout: No response in time
+            ConnectionError: The interpreter exited
+            ValueError: The response is malformed, oversized or not for this request
+        """
+        nonce = uuid.uuid4().hex
+        request = marshal.dumps({
+            "nonce": nonce,
+            "payload": _compile_cells(cells, filenames),
+            "filenames": filenames,
+            "context": context_path,
+            "context_digest": self._context_digest,
+            "timeout": self.timeout,
+            "max_output_bytes": self.max_output_bytes,
+        })
+        
+        response = json.loads(repl.request(request, self.timeout + _TIMEOUT_KILL_GRACE, self._response_limit(len(cells))))
+        if not isinstance(response, dict) or response.get("nonce") != nonce:
+            raise SandboxProtocolError("Response does not answer the request")
+        return response
+    
+    def _response_limit(self, cell_count: int) -> int:
+        """Largest response frame the interpreter can legitimately send for cell_count cells."""
+        return (_JSON_ESCAPE_FACTOR * self.max_output_bytes
+                + _RESPONSE_CELL_OVERHEAD * cell_count + _RESPONSE_OVERHEAD)
+    
+    @abc.abstractmethod
+    def _ensure_repl(self):
+        """
+        Return the channel to the session's interpreter, starting it if needed.
+        
+        The channel's request(data, timeout, max_size) sends one frame and
+        returns the response frame, raising socket.timeout, ConnectionError,
+        or SandboxProtocolError for a frame larger than max_size.
+        
+        Returns:
+            Channel to the running interpreter
+        """
+    
+    def _recover(self):
+        """Called after one of _backend_errors, once the sandbox has been stopped."""
+    
+    def _close_repl(self):
+        """Disconnect from the session's interpreter, which then exits on EOF."""
+        repl, self._repl = self._repl, None
+        if repl is not None:
+            repl.close()
+    
+    def close(self):
+        """
+        Stop the session's sandbox, keeping the session directory.
+        
+        Waits for an execution in progress on another thread to finish first.
+        """
+        with self._repl_lock:
+            self._teardown()
+    
+    def reset(self):
+        """
+        Discard the session's state, keeping its sandbox running.
+        
+        Empties the sandbox's working directory and the session directory and
+        restarts the interpreter, so the next execution starts with no globals
+        and no files, without paying for a new sandbox. If the working
+        directory cannot be emptied, the sandbox is stopped instead.
+        """
+        wipe = (
+            "import os, shutil\n"
+            f"for entry in os.scandir({self.SCRATCH_DIR!r}):\n"
+            "    if entry.is_dir(follow_symlinks=False):\n"
+            "        shutil.rmtree(entry.path)\n"
+            "    else:\n"
+            "        os.remove(entry.path)\n"
+        )
+        with self._repl_lock:
+            try:
+                response = self._request(self._ensure_repl(), [wipe], [_USER_CODE_FILENAME], None)
+            except (ConnectionError, socket.timeout, ValueError):
+                response = None
+            
+            # Any output is an error; a new sandbox starts out empty
+            if response is None or any(response["outputs"]):
+                self._teardown()
+            else:
+                self._close_repl()
+            
+            # rmtree does not follow symlinks the sandbox may have planted
+            for entry in os.scandir(self.session_dir):
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            self._context_digest = None
+    
+    def _teardown(self):
+        """Stop the interpreter and release the sandbox; called with _repl_lock held."""
+        self._close_repl()
+    
+    def _write_context(self, context: Dict[str, Any]):
+        """
+        Pickle the context into the session directory for the sandbox to load.
+        
+        The file is only rewritten when the serialized context changes. Values
+        that cannot be pickled (modules, open handles, ...) are skipped.
+        
+        Args:
+            context: Context dictionary to deliver to the sandbox
+        """
+        try:
+            payload = pickle.dumps(context, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            picklable = {}
+            for key, value in context.items():
+                try:
+                    pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                except Exception:
+                    logger.warning(f"Skipping unpicklable context variable: {key}")
+                    continue
+                picklable[key] = value
+            payload = pickle.dumps(picklable, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        digest = hashlib.sha256(payload).digest()
+        if digest == self._context_digest:
+            return
+        
+        _write_file(self.session_dir / _CONTEXT_FILENAME, payload)
+        self._context_digest = digest
+    
+    def get_session_files(self) -> list:
+        """
+        Get list of files created in the session directory.
+        
+        Returns:
+            List of file paths relative to session directory
+        """
+        if not self.session_dir.exists():
+            return []
+        
+        root = str(self.session_dir)
+        
+        # DirEntry caches the type from the directory listing, so no extra stat per file
+        def _walk(path: str):
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from _walk(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and not entry.name.startswith('script_'):
+                        yield os.path.relpath(entry.path, root)
+        
+        return list(_walk(root))
+    
+    @abc.abstractmethod
+    def copy_out(self, container_path: str = SCRATCH_DIR, host_dir: Optional[str] = None) -> List[str]:
+        """
+        Copy a directory out of the sandbox.
+        
+        Args:
+            container_path: Directory inside the sandbox to copy
+            host_dir: Destination directory on the host (defaults to the session directory)
+            
+        Returns:
+            List of copied file paths relative to the destination directory
+        """
+    
+    def read_session_file(self, filename: str) -> str:
+        """
+        Read a file from the session directory.
+        
+        Args:
+            filename: Filename relative to session directory
+            
+        Returns:
+            File contents as string
+        """
+        # Resolve symlinks first: the sandbox may have planted them in the session directory
+        file_path = (self.session_dir / filename).resolve()
+        
+        if not file_path.is_relative_to(self.session_dir.resolve()):
+            raise ValueError("Path traversal attempt detected")
+        
+        if not file_path.exists():
+            raise FileNotFoundError(f"File not found: {filename}")
+        
+        return file_path.read_text()
+    
+    def cleanup(self):
+        """
+        Clean up session directory and resources.
+        """
+        self.close()
+        
+        try:
+            if self.session_dir.exists():
+                shutil.rmtree(self.session_dir)
+                self._context_digest = None
+                logger.info(f"Cleaned up session directory: {self.session_id}")
+        except Exception as e:
+            logger.error(f"Failed to cleanup session {self.session_id}: {e}")
+    
+    def start(self):
+        """
+        Start the session's sandbox and interpreter ahead of the first execution.
+        
+        An empty request checks that the interpreter actually runs: some
+        backends only fail once it starts (bwrap without unprivileged user
+        namespaces, for example).
+        
+        Returns:
+            The executor itself
+            
+        Raises:
+            RuntimeError: The interpreter exited or did not answer
+        """
+        with self._repl_lock:
+            repl = self._ensure_repl()
+            try:
+                self._request(repl, [], [], None)
+            except (ConnectionError, socket.timeout, ValueError) as e:
+                self._teardown()
+                raise RuntimeError(f"Sandbox interpreter failed to start for session {self.session_id}: {e}") from e
+        return self
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit; stops the sandbox but keeps session files."""
+        # Optionally cleanup on exit
+        # self.cleanup()
+        self.close()
+
+
+__all__ = [
+    'ALLOWED_LIBRARIES',
+    'SandboxExecutor',
+    'SandboxProtocolError',
+    'validate_imports',
+    'validate_imports_bool',
+]